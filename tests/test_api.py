@@ -1,7 +1,149 @@
 import json
 import requests
+from pymongo.errors import ServerSelectionTimeoutError
+
+from backend import app, routes
 
 
 def test_health(client):
     res = client.get("/health")
     assert res.status_code == 200
+
+
+def test_songs_etag_not_modified(client):
+    res = client.get("/song")
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+
+    res = client.get("/song", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+
+
+def test_songs_cache_invalidated_on_post(client):
+    res = client.get("/song")
+    etag = res.headers["ETag"]
+    new_id = max(song["id"] for song in res.json["songs"]) + 1
+
+    res = client.post("/song", json={"id": new_id, "title": "new song", "lyrics": "la la"})
+    assert res.status_code == 201
+
+    res = client.get("/song", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert new_id in [song["id"] for song in res.json["songs"]]
+
+
+def test_songs_cache_invalidated_on_put(client):
+    res = client.get("/song")
+    etag = res.headers["ETag"]
+    song_id = res.json["songs"][0]["id"]
+    title = f"updated {etag}"
+
+    res = client.put(f"/song/{song_id}", json={"title": title})
+    assert res.status_code == 201
+
+    res = client.get("/song", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert title in [song["title"] for song in res.json["songs"]]
+
+
+def test_songs_cache_not_stored_after_concurrent_write():
+    def racing_cursor():
+        # A write commits and invalidates while the GET is still reading the cursor
+        routes.invalidate_songs_cache()
+        yield {"id": 1}
+
+    routes._fill_songs_cache(racing_cursor())
+    assert routes._songs_cache is None
+
+
+def test_get_song_reflects_put(client):
+    res = client.get("/song/1")
+    assert res.status_code == 200
+    title = res.json["title"] + " (updated)"
+
+    res = client.put("/song/1", json={"title": title})
+    assert res.status_code == 201
+    # The cached entry is dropped rather than replaced, so the next read refetches it
+    assert 1 not in routes._by_id
+
+    res = client.get("/song/1")
+    assert res.status_code == 200
+    assert res.json["title"] == title
+
+
+def test_put_song_unchanged_and_missing(client):
+    title = client.get("/song/2").json["title"]
+
+    res = client.put("/song/2", json={"title": title})
+    assert res.status_code == 200
+
+    res = client.put("/song/999999", json={"title": "missing"})
+    assert res.status_code == 404
+
+
+def test_put_song_null_for_missing_field_is_an_update(client):
+    new_id = max(song["id"] for song in client.get("/song").json["songs"]) + 1
+    res = client.post("/song", json={"id": new_id, "title": "no lyrics"})
+    assert res.status_code == 201
+
+    res = client.put(f"/song/{new_id}", json={"lyrics": None})
+    assert res.status_code == 201
+
+    res = client.get(f"/song/{new_id}")
+    assert "lyrics" in res.json and res.json["lyrics"] is None
+    song = next(song for song in client.get("/song").json["songs"] if song["id"] == new_id)
+    assert "lyrics" in song and song["lyrics"] is None
+
+
+def test_put_song_type_change_is_an_update(client):
+    res = client.put("/song/3", json={"title": 1})
+    assert res.status_code == 201
+
+    res = client.put("/song/3", data=b'{"title": 1.0}', content_type="application/json")
+    assert res.status_code == 201
+    assert isinstance(client.get("/song/3").json["title"], float)
+
+
+def test_songs_cache_expires_after_ttl(client, monkeypatch):
+    client.get("/song")
+    cached = routes._songs_cache
+    client.get("/song")
+    assert routes._songs_cache is cached
+
+    # Writes from other workers never invalidate this process's cache, so it expires
+    monkeypatch.setattr(routes, "SONG_CACHE_TTL", 0)
+    client.get("/song")
+    assert routes._songs_cache is not cached
+
+
+def test_database_init_failure(client, monkeypatch):
+    calls = []
+
+    def failing_init():
+        calls.append(1)
+        raise ServerSelectionTimeoutError("no servers")
+
+    monkeypatch.setattr(routes, "_db_ready", False)
+    monkeypatch.setattr(routes, "_db_retry_at", 0.0)
+    monkeypatch.setattr(routes, "_init_db", failing_init)
+
+    assert client.get("/health").status_code == 200
+    for path in ("/count", "/song"):
+        res = client.get(path)
+        assert res.status_code == 503
+        assert res.json == {"error": "Database unavailable"}
+    # The second request is inside the back-off window and doesn't retry
+    assert len(calls) == 1
+
+
+def test_seed_songs_command_reloads_collection(client):
+    new_id = max(song["id"] for song in client.get("/song").json["songs"]) + 1
+    client.post("/song", json={"id": new_id, "title": "gone after reseed"})
+
+    result = app.test_cli_runner().invoke(args=["seed-songs"])
+    assert result.exit_code == 0
+    assert routes.db.songs.count_documents({}) == len(routes.songs_list)
+    assert routes.db.songs.find_one({"id": new_id}) is None
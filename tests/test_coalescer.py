@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pytest
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError, WriteConcernError
+
+from backend import routes
+from backend.routes import _WriteCoalescer
+
+
+class FakeCollection:
+    """Records each bulk_write batch and raises whatever error it is given."""
+
+    def __init__(self, error=None, block=None):
+        self.batches = []
+        self.error = error
+        self.block = block
+
+    def bulk_write(self, ops, ordered):
+        assert ordered is False
+        if self.block is not None:
+            self.block.wait()
+        self.batches.append(ops)
+        if self.error is not None:
+            raise self.error
+
+
+def submit_all(coalescer, ops):
+    """Submits ops concurrently and returns each one's result or exception."""
+    def submit(op):
+        try:
+            return coalescer.submit(op)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(ops)) as executor:
+        return list(executor.map(submit, ops))
+
+
+def inserts(count):
+    return [InsertOne({"id": i}) for i in range(count)]
+
+
+def test_mixed_write_errors_fail_only_failing_op():
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "dup"}]})
+    collection = FakeCollection(error=error)
+    coalescer = _WriteCoalescer(collection, max_ops=3, max_wait=5)
+
+    ops = inserts(3)
+    results = submit_all(coalescer, ops)
+
+    assert len(collection.batches) == 1
+    # The batch order is up to the threads, so check the op that landed at index 1
+    failing_op = collection.batches[0][1]
+    for op, result in zip(ops, results):
+        if op is failing_op:
+            assert isinstance(result, DuplicateKeyError)
+        else:
+            assert result is None
+
+
+def test_write_concern_errors_fail_applied_ops():
+    error = BulkWriteError({
+        "writeErrors": [{"index": 0, "code": 11000, "errmsg": "dup"}],
+        "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}],
+    })
+    collection = FakeCollection(error=error)
+    coalescer = _WriteCoalescer(collection, max_ops=2, max_wait=5)
+
+    ops = inserts(2)
+    results = submit_all(coalescer, ops)
+
+    failing_op = collection.batches[0][0]
+    for op, result in zip(ops, results):
+        if op is failing_op:
+            assert isinstance(result, DuplicateKeyError)
+        else:
+            assert isinstance(result, WriteConcernError)
+
+
+def test_flushes_when_max_ops_reached():
+    collection = FakeCollection()
+    coalescer = _WriteCoalescer(collection, max_ops=2, max_wait=10)
+
+    start = time.monotonic()
+    assert submit_all(coalescer, inserts(2)) == [None, None]
+
+    assert time.monotonic() - start < 5
+    assert [len(batch) for batch in collection.batches] == [2]
+
+
+def test_flushes_when_max_wait_elapses():
+    collection = FakeCollection()
+    coalescer = _WriteCoalescer(collection, max_ops=50, max_wait=0.05)
+
+    assert coalescer.submit(InsertOne({"id": 1})) is None
+    assert [len(batch) for batch in collection.batches] == [1]
+
+
+def test_submit_times_out_when_flusher_is_stuck():
+    release = threading.Event()
+    coalescer = _WriteCoalescer(FakeCollection(block=release), max_wait=0, timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        coalescer.submit(InsertOne({"id": 1}))
+    release.set()
+
+
+def test_generic_error_is_wrapped_per_request():
+    cause = RuntimeError("connection reset")
+    coalescer = _WriteCoalescer(FakeCollection(error=cause), max_ops=2, max_wait=5)
+
+    first, second = submit_all(coalescer, inserts(2))
+
+    assert isinstance(first, PyMongoError) and isinstance(second, PyMongoError)
+    assert first is not second
+    assert first.__cause__ is cause and second.__cause__ is cause
+
+
+def test_create_song_duplicate_through_coalescer(client, monkeypatch):
+    monkeypatch.setattr(routes, "_coalescer", _WriteCoalescer(routes.db.songs))
+    new_id = max(song["id"] for song in client.get("/song").json["songs"]) + 1
+
+    res = client.post("/song", json={"id": new_id, "title": "batched", "lyrics": "la"})
+    assert res.status_code == 201
+
+    res = client.post("/song", json={"id": new_id, "title": "batched", "lyrics": "la"})
+    assert res.status_code == 302
+
+
+def test_create_song_timeout_is_outcome_unknown(client, monkeypatch):
+    release = threading.Event()
+    flushed = threading.Event()
+
+    def on_flush():
+        routes.invalidate_songs_cache()
+        flushed.set()
+
+    coalescer = _WriteCoalescer(FakeCollection(block=release), max_wait=0, timeout=0.1,
+                                on_flush=on_flush)
+    monkeypatch.setattr(routes, "_coalescer", coalescer)
+    client.get("/song")
+
+    res = client.post("/song", json={"id": 999999, "title": "slow"})
+    assert res.status_code == 504
+    assert routes._songs_cache is None
+
+    # The insert commits after the request gave up; the flush invalidates again
+    client.get("/song")
+    release.set()
+    assert flushed.wait(5)
+    assert routes._songs_cache is None